@@ -1,39 +1,79 @@
 import os
 import time
-import json
-import requests
+import re
 import asyncio
+import aiohttp
 import discord
-from discord.ext import tasks
+import orjson
 import random
+import signal
+import logging
+import logging.handlers
+import queue
+import threading
+import itertools
+from collections import OrderedDict
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+try:
+    import uvloop  # Faster event loop; not available on Windows
+except ImportError:
+    uvloop = None
+
+#################################
+# Logging
+#################################
+LOG_LEVEL = logging.INFO  # Set to logging.DEBUG to see per-request and per-activity details
+
+# Log calls only put records on a queue; a background thread writes them to the console,
+# so a slow terminal or pipe never blocks the event loop
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s"))
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, log_stream_handler)
+log_listener.start()
+
+log_queue_handler = logging.handlers.QueueHandler(log_queue)
+# Only render the message here; the listener's handler applies the full format
+log_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+
+logging.basicConfig(level=LOG_LEVEL, handlers=[log_queue_handler])
+logger = logging.getLogger("bot")
 
 #################################
 # OPTIONAL ENS LOOKUP
 #################################
 ENS_ENABLED = True  # Set to False if you do not want to do ENS lookups
-ens_cache = {}  # address -> ens name (string) or None
+ENS_CACHE_TTL = 86400  # Seconds to keep a resolved ENS name
+ENS_NEGATIVE_CACHE_TTL = 3600  # Seconds to keep "no ENS name" results, so new registrations show up
+ENS_CACHE_MAX_SIZE = 10000
+ENS_CACHE_FILE = "ens_cache.json"  # Persisted so restarts don't repeat every lookup
+ENS_CACHE_FLUSH_INTERVAL = 60  # Seconds between writes of a changed ENS cache
 
-def ensideas_lookup_sync(address: str) -> str | None:
+ens_cache = {}  # address -> (ens name (string) or None, fetched_at), oldest first
+ens_cache_dirty = False
+ens_inflight = {}  # address -> asyncio.Task of a lookup in progress, shared by concurrent callers
+
+async def ensideas_lookup(address: str) -> str | None:
     """
     Does an HTTP GET request to https://api.ensideas.com/ens/resolve/<address>.
     If 'name' is not null, return it, else return None.
     """
     url = f"https://api.ensideas.com/ens/resolve/{address}"
-    print(f"[DEBUG] ensideas_lookup_sync() - Fetching ENS from {url}")
+    logger.debug("ensideas_lookup() - Fetching ENS from %s", url)
     try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        data = await get_json(url, limiter=ens_limiter, timeout=10)
         # "name" is the field if ENS is set
         name = data.get("name")
         return name  # Could be None or a string like "capsulemachine.eth"
     except Exception as e:
-        print(f"[DEBUG] ENS lookup failed for {address}: {e}")
+        logger.warning("ENS lookup failed for %s: %s", address, e)
         return None
 
 async def get_ens_or_short(address: str, chain: str) -> str:
     """
-    If ENS is enabled, use the ensideas_lookup_sync to see
+    If ENS is enabled, use ensideas_lookup to see
     if there's an ENS name. Otherwise, return a shortened address.
     """
     # Always keep addresses consistent (lowercase)
@@ -43,19 +83,117 @@ async def get_ens_or_short(address: str, chain: str) -> str:
     if not ENS_ENABLED:
         return shorten_address(address)
 
-    # If cached, return cached result if present
-    if address in ens_cache:
-        cached_name = ens_cache[address]
-        return cached_name if cached_name else shorten_address(address)
+    cached = get_cached_ens(address)
+    if cached is not None:
+        return cached or shorten_address(address)
 
-    # Not cached, so fetch from ensideas in a thread
-    result_name = await asyncio.to_thread(ensideas_lookup_sync, address)
-    if result_name:
-        ens_cache[address] = result_name
-        return result_name
-    else:
-        ens_cache[address] = None
-        return shorten_address(address)
+    # Not cached, so fetch from ensideas (joining any lookup already in flight for this address)
+    result_name = await single_flight(ens_inflight, address, lambda: resolve_and_cache_ens(address))
+    return result_name or shorten_address(address)
+
+async def resolve_and_cache_ens(address: str) -> str | None:
+    result_name = await ensideas_lookup(address)
+    cache_ens(address, result_name)
+    return result_name
+
+async def get_ens_or_short_or_unknown(address: str, chain: str) -> str:
+    """Like get_ens_or_short, but returns "Unknown" for an empty address."""
+    if not address:
+        return "Unknown"
+    return await get_ens_or_short(address, chain)
+
+def get_cached_ens(address: str) -> str | None:
+    """
+    Return the cached ENS name, "" for a cached negative result,
+    or None if the address is not cached or its entry has expired.
+    """
+    entry = ens_cache.get(address)
+    if entry is None:
+        return None
+    name, fetched_at = entry
+    ttl = ENS_CACHE_TTL if name else ENS_NEGATIVE_CACHE_TTL
+    if time.time() - fetched_at >= ttl:
+        del ens_cache[address]
+        return None
+    return name or ""
+
+def cache_ens(address: str, name: str | None):
+    global ens_cache_dirty
+    # Re-insert so dict order stays oldest-fetched first, then evict the oldest entries
+    ens_cache.pop(address, None)
+    ens_cache[address] = (name, time.time())
+    while len(ens_cache) > ENS_CACHE_MAX_SIZE:
+        del ens_cache[next(iter(ens_cache))]
+    ens_cache_dirty = True
+
+def load_ens_cache():
+    """Load unexpired entries from ENS_CACHE_FILE, oldest first."""
+    if not os.path.exists(ENS_CACHE_FILE):
+        return
+    try:
+        with open(ENS_CACHE_FILE, "rb") as f:
+            data = orjson.loads(f.read())
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+    except Exception as e:
+        logger.warning("Error loading ENS cache from %s: %s", ENS_CACHE_FILE, e)
+        return
+    # Keep only well-formed entries; a bad entry is skipped rather than stopping startup
+    entries = []
+    skipped = 0
+    for address, entry in data.items():
+        if (
+            isinstance(entry, dict)
+            and isinstance(entry.get("ts"), (int, float))
+            and isinstance(entry.get("name"), (str, type(None)))
+        ):
+            entries.append((address.lower(), entry["name"], entry["ts"]))
+        else:
+            skipped += 1
+    if skipped:
+        logger.warning("Skipped %s malformed entries in %s", skipped, ENS_CACHE_FILE)
+    now = time.time()
+    entries.sort(key=lambda item: item[2])
+    for address, name, fetched_at in entries[-ENS_CACHE_MAX_SIZE:]:
+        ttl = ENS_CACHE_TTL if name else ENS_NEGATIVE_CACHE_TTL
+        if now - fetched_at < ttl:
+            ens_cache[address] = (name, fetched_at)
+    logger.debug("Loaded %s ENS cache entries from %s", len(ens_cache), ENS_CACHE_FILE)
+
+def serialize_ens_cache():
+    return orjson.dumps({address: {"name": name, "ts": fetched_at} for address, (name, fetched_at) in ens_cache.items()})
+
+def save_ens_cache():
+    """Write the ENS cache if it changed since the last save (synchronous, used at shutdown)."""
+    global ens_cache_dirty
+    if not ens_cache_dirty:
+        return
+    ens_cache_dirty = False
+    try:
+        write_file_atomic(ENS_CACHE_FILE, serialize_ens_cache())
+    except Exception as e:
+        logger.warning("Error saving ENS cache to %s: %s", ENS_CACHE_FILE, e)
+
+async def flush_ens_cache_loop():
+    global ens_cache_dirty
+    while True:
+        await asyncio.sleep(ENS_CACHE_FLUSH_INTERVAL)
+        if not ens_cache_dirty:
+            continue
+        ens_cache_dirty = False
+        try:
+            # Serialize on the event loop, write the file in a worker thread
+            await asyncio.to_thread(write_file_atomic, ENS_CACHE_FILE, serialize_ens_cache())
+        except asyncio.CancelledError:
+            # Cancelled at shutdown: leave the write to save_ens_cache()
+            ens_cache_dirty = True
+            raise
+        except Exception as e:
+            logger.warning("Error saving ENS cache to %s: %s", ENS_CACHE_FILE, e)
+            ens_cache_dirty = True
+
+if ENS_ENABLED:
+    load_ens_cache()
 
 
 #################################
@@ -63,59 +201,85 @@ async def get_ens_or_short(address: str, chain: str) -> str:
 #################################
 def load_file_secret(path):
     """Load a single secret (for Discord bot token)."""
-    print(f"[DEBUG] Loading single file secret from {path}")
+    logger.debug("Loading single file secret from %s", path)
     if not os.path.exists(path):
         raise FileNotFoundError(f"Could not find file: {path}")
     with open(path, "r") as f:
         secret = f.read().strip()
-    print("[DEBUG] Successfully loaded single secret.")
+    logger.debug("Successfully loaded single secret.")
     return secret
 
+def load_file_secrets(path):
+    """Load one secret per line, skipping blank lines and # comments (for API keys)."""
+    logger.debug("Loading multi-line secrets from %s", path)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Could not find file: {path}")
+    with open(path, "r") as f:
+        secrets = [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+    if not secrets:
+        raise ValueError(f"No secrets found in {path}")
+    logger.debug("Successfully loaded %s secrets.", len(secrets))
+    return secrets
+
 DISCORD_BOT_TOKEN = load_file_secret("discord_bot.token")
 
 # OpenSea support is optional - only enable if API key file exists
 OPENSEA_ENABLED = False
-OPENSEA_API_KEY = None
+OPENSEA_API_KEYS = []
 if os.path.exists("opensea.token"):
     try:
-        OPENSEA_API_KEY = load_file_secret("opensea.token")
+        OPENSEA_API_KEYS = load_file_secrets("opensea.token")
         OPENSEA_ENABLED = True
-        print("[DEBUG] OpenSea API key loaded successfully. OpenSea support enabled.")
+        logger.info("Loaded %s OpenSea API key(s). OpenSea support enabled.", len(OPENSEA_API_KEYS))
     except Exception as e:
-        print(f"[DEBUG] Error loading OpenSea API key: {e}. OpenSea support disabled.")
+        logger.warning("Error loading OpenSea API key: %s. OpenSea support disabled.", e)
 else:
-    print("[DEBUG] opensea.token file not found. OpenSea support disabled.")
+    logger.info("opensea.token file not found. OpenSea support disabled.")
 
 #################################
 # Load Collection Configs
 #################################
 def load_collection_configs(path):
-    print(f"[DEBUG] Loading collection configs from {path}")
+    logger.debug("Loading collection configs from %s", path)
     if not os.path.exists(path):
         raise FileNotFoundError(f"Could not find config file: {path}")
-    with open(path, "r") as f:
-        data = json.load(f)
-    print("[DEBUG] Collection configs loaded successfully.")
+    with open(path, "rb") as f:
+        data = orjson.loads(f.read())
+    logger.debug("Collection configs loaded successfully.")
     return data
 
 collections_data = load_collection_configs("collection_configs.json")
 COLLECTIONS = collections_data["collections"]
-print(f"[DEBUG] Found {len(COLLECTIONS)} collections in the config file.")
+logger.info("Found %s collections in the config file.", len(COLLECTIONS))
+
+DEFAULT_BURN_MESSAGES = [
+    {"weight": 1.0, "message": "{tokenName} has been burned!"}
+]
 
 #################################
 # Known IDs & Timestamps
 #################################
+# contract -> OrderedDict of "{tokenId}-{txHash}" -> None, oldest first.
+# OrderedDict gives O(1) membership checks and O(1) eviction of the oldest entry.
 known_sales = {}
 known_mints = {}
 known_burns = {}
 
 # Track token ID cooldowns per collection
-token_id_cooldowns = {}  # contract -> {token_id -> timestamp}
+token_id_cooldowns = {}  # contract -> {token_id -> timestamp}, ordered oldest first
 
 last_check_sales_timestamp = {}
 last_check_activity_timestamp = {}
 last_check_opensea_timestamp = {}
 
+STATE_FLUSH_INTERVAL = 5  # Seconds between writes of changed collection state
+
+dirty_state_contracts = set()  # contracts whose state changed since the last flush
+
+def get_state_file(contract_address):
+    return f"state_{contract_address}.json"
+
+# Legacy per-list tracking files, only read to migrate into the state file
 def get_sales_file(contract_address):
     return f"known_sales_{contract_address}.txt"
 
@@ -125,59 +289,244 @@ def get_mints_file(contract_address):
 def get_burns_file(contract_address):
     return f"known_burns_{contract_address}.txt"
 
+# Expected ID format: {tokenId}-{txHash}, e.g. 123-0xabc...
+ID_FORMAT_RE = re.compile(r"\d+-0x[0-9a-fA-F]+")
+
 def is_valid_id_format(line):
     """Check if ID is in expected format: {tokenId}-{txHash}"""
-    if "-" not in line:
-        return False
-    parts = line.split("-", 1)  # Split on first hyphen only
-    if len(parts) != 2:
-        return False
-    token_id, tx_hash = parts
-    # Token ID should be numeric, tx hash should start with 0x
-    return token_id.isdigit() and tx_hash.startswith("0x")
+    return ID_FORMAT_RE.fullmatch(line) is not None
 
 def load_ids(filename):
-    print(f"[DEBUG] Loading IDs from {filename}")
+    logger.debug("Loading IDs from %s", filename)
     if not os.path.exists(filename):
-        print(f"[DEBUG] File does not exist: {filename}, returning empty list.")
+        logger.debug("File does not exist: %s, returning empty list.", filename)
         return []
     with open(filename, "r") as f:
         lines = [line.strip() for line in f if line.strip()]
 
     # Keep only entries in the expected format: tokenId-0xHash
-    old_count = len(lines)
     cleaned_lines = [line for line in lines if is_valid_id_format(line)]
+    if len(cleaned_lines) < len(lines):
+        logger.debug("Pruned %s invalid format entries from %s", len(lines) - len(cleaned_lines), filename)
 
-    if len(cleaned_lines) < old_count:
-        pruned_count = old_count - len(cleaned_lines)
-        print(f"[DEBUG] Pruned {pruned_count} invalid format entries from {filename}")
-        # Save the cleaned list back to file
-        save_ids(cleaned_lines, filename)
-
-    print(f"[DEBUG] Loaded {len(cleaned_lines)} IDs from {filename}")
+    logger.debug("Loaded %s IDs from %s", len(cleaned_lines), filename)
     return cleaned_lines
 
-def save_ids(ids_list, filename):
-    print(f"[DEBUG] Saving {len(ids_list)} IDs to {filename}")
-    with open(filename, "w") as f:
-        for _id in ids_list:
-            f.write(f"{_id}\n")
+def load_state(contract):
+    """
+    Load known IDs and cooldowns for a contract from its state file.
+    Falls back to the legacy known_*.txt files if there is no state file yet,
+    or if it can't be read.
+    """
+    filename = get_state_file(contract)
+    state = None
+    if os.path.exists(filename):
+        logger.debug("Loading state from %s", filename)
+        try:
+            with open(filename, "rb") as f:
+                state = orjson.loads(f.read())
+            if not isinstance(state, dict):
+                raise ValueError("expected a JSON object")
+        except Exception as e:
+            logger.warning("Error loading state from %s: %s. Falling back to legacy ID files.", filename, e)
+            state = None
+    else:
+        logger.debug("State file does not exist: %s, migrating legacy ID files.", filename)
+    if state is None:
+        state = {
+            "sales": load_ids(get_sales_file(contract)),
+            "mints": load_ids(get_mints_file(contract)),
+            "burns": load_ids(get_burns_file(contract)),
+        }
+        dirty_state_contracts.add(contract)
+
+    cfg = PROCESSED_COLLECTIONS[contract]
+    known_sales[contract] = OrderedDict.fromkeys(valid_state_ids(state.get("sales")))
+    known_mints[contract] = OrderedDict.fromkeys(valid_state_ids(state.get("mints")))
+    known_burns[contract] = OrderedDict.fromkeys(valid_state_ids(state.get("burns")))
+    # Apply the caps now, in case max_known_* was lowered since the state was saved
+    trim_known_ids(known_sales[contract], cfg.max_known_sales)
+    trim_known_ids(known_mints[contract], cfg.max_known_mints)
+    trim_known_ids(known_burns[contract], cfg.max_known_burns)
+    # Keep cooldowns ordered oldest first, as purge_expired_cooldowns expects
+    cooldowns = state.get("cooldowns")
+    if not isinstance(cooldowns, dict):
+        cooldowns = {}
+    valid_cooldowns = [item for item in cooldowns.items() if isinstance(item[1], (int, float))]
+    token_id_cooldowns[contract] = dict(sorted(valid_cooldowns, key=lambda item: item[1]))
+    # Drop cooldowns that expired while the bot was offline
+    purge_expired_cooldowns(contract, int(time.time()), cfg.cooldown_seconds)
+
+def valid_state_ids(ids):
+    """IDs from a state file list, keeping only strings in the tokenId-0xHash format."""
+    if not isinstance(ids, list):
+        return []
+    return [_id for _id in ids if isinstance(_id, str) and is_valid_id_format(_id)]
 
-print("[DEBUG] Initializing known IDs and timestamps for each collection...")
+def trim_known_ids(known_ids, max_len):
+    """Evict the oldest IDs until at most max_len remain (O(1) per eviction)."""
+    while len(known_ids) > max_len:
+        known_ids.popitem(last=False)
+
+def remember_id(known_ids, _id, max_len):
+    known_ids[_id] = None
+    trim_known_ids(known_ids, max_len)
+
+def serialize_state(contract):
+    """Snapshot a contract's state as JSON bytes (on the event loop, so it's consistent)."""
+    return orjson.dumps({
+        "sales": list(known_sales[contract]),
+        "mints": list(known_mints[contract]),
+        "burns": list(known_burns[contract]),
+        "cooldowns": token_id_cooldowns[contract],
+    })
+
+def save_state(contract):
+    write_file_atomic(get_state_file(contract), serialize_state(contract))
+
+def mark_state_dirty(contract):
+    dirty_state_contracts.add(contract)
+
+async def flush_dirty_state_async():
+    """
+    Write every dirty contract's state. The snapshot is taken on the event loop,
+    the file write runs in a worker thread so disk stalls don't block polling.
+    Writes are awaited one at a time, so two writes of the same file never overlap.
+    """
+    for contract in list(dirty_state_contracts):
+        # Discard before snapshotting, so changes made during the write mark it dirty again
+        dirty_state_contracts.discard(contract)
+        logger.debug("Saving state for %s", contract)
+        try:
+            await asyncio.to_thread(write_file_atomic, get_state_file(contract), serialize_state(contract))
+        except asyncio.CancelledError:
+            # Cancelled at shutdown: leave it, and everything not yet written, to flush_dirty_state()
+            dirty_state_contracts.add(contract)
+            raise
+        except Exception as e:
+            logger.warning("Error saving state for %s: %s", contract, e)
+            # Retry on the next flush
+            dirty_state_contracts.add(contract)
+
+def flush_dirty_state():
+    """Synchronous flush, used at shutdown once the event loop has stopped."""
+    contracts = list(dirty_state_contracts)
+    dirty_state_contracts.clear()
+    for contract in contracts:
+        logger.debug("Saving state for %s", contract)
+        try:
+            save_state(contract)
+        except Exception as e:
+            logger.warning("Error saving state for %s: %s", contract, e)
+
+async def flush_state_loop():
+    """Debounce state writes: many new events in a few seconds become one write per collection."""
+    while True:
+        await asyncio.sleep(STATE_FLUSH_INTERVAL)
+        await flush_dirty_state_async()
+
+def start_token_cooldown(contract, token_id, now):
+    # Re-insert so each dict stays ordered by cooldown start time
+    cooldowns = token_id_cooldowns[contract]
+    cooldowns.pop(token_id, None)
+    cooldowns[token_id] = now
+
+def token_in_cooldown(contract, token_id, now, cooldown_seconds):
+    # Compare times instead of testing membership: a cooldown started earlier in the same
+    # batch is still in the dict, but with id_cooldown 0 it must not block the next sale
+    started = token_id_cooldowns[contract].get(token_id)
+    return started is not None and now - started < cooldown_seconds
+
+def purge_expired_cooldowns(contract, now, cooldown_seconds):
+    """Drop expired cooldowns from the front of the dict so it doesn't grow forever."""
+    cooldowns = token_id_cooldowns[contract]
+    purged = False
+    while cooldowns:
+        oldest_token_id = next(iter(cooldowns))
+        if now - cooldowns[oldest_token_id] < cooldown_seconds:
+            break
+        del cooldowns[oldest_token_id]
+        purged = True
+    # Persist the purge too, so the state file shrinks along with the dict
+    if purged:
+        mark_state_dirty(contract)
+
+def build_collection_settings(coll):
+    """
+    Resolve a collection config's values and defaults once, so the processors
+    and embed builders read plain attributes instead of calling
+    coll_config.get(...) per activity.
+    """
+    burn_messages, burn_cum_weights = build_burn_messages(coll)
+    return SimpleNamespace(
+        name=coll.get("name", "Unknown"),
+        # Used for "{name} #{tokenId}" when a minted token has no name of its own
+        token_name_prefix=coll.get("name", "Unknown Collection"),
+        contract=coll["contract_address"].lower(),
+        chain=coll.get("chain", "ethereum"),
+        opensea_slug=coll.get("opensea_collection_slug"),
+        # default poll_interval to 300 (5 mins) if not specified
+        poll_interval=coll.get("poll_interval", 300),
+        activity_limit=coll.get("activity_limit", 50),
+        sales_limit=coll.get("sales_limit", 50),
+        max_known_sales=coll.get("max_known_sales", 50),
+        max_known_mints=coll.get("max_known_mints", 100),
+        max_known_burns=coll.get("max_known_burns", 100),
+        # id_cooldown is in minutes, default to 60 if not specified
+        cooldown_seconds=coll.get("id_cooldown", 60) * 60,
+        zero_addr=coll.get("zero_address", "0x0000000000000000000000000000000000000000").lower(),
+        sales_channel_id=coll.get("discord_sales_channel_id", 0),
+        mint_channel_id=coll.get("discord_mint_channel_id", 0),
+        burn_channel_id=coll.get("discord_burn_channel_id", 0),
+        tx_link_base=coll.get("transaction_link_base", "https://abscan.org/tx/"),
+        json_base_uri=coll.get("json_base_uri", "").rstrip("/"),
+        burn_messages=burn_messages,
+        burn_cum_weights=burn_cum_weights,
+    )
+
+def build_burn_messages(coll):
+    """
+    Split burn messages into messages and cumulative weights once, instead of on every burn.
+    A missing weight counts as 1.0. Entries without a message string are skipped, and if
+    nothing usable is left, or every weight is 0, the default burn message is used.
+    """
+    coll_name = coll.get("name", "Unknown")
+    messages = []
+    weights = []
+    for item in coll.get("burn_messages") or []:
+        if not isinstance(item, dict) or not isinstance(item.get("message"), str):
+            logger.warning("[%s] Skipping burn message without a \"message\" string: %r", coll_name, item)
+            continue
+        weight = item.get("weight", 1.0)
+        if not isinstance(weight, (int, float)) or weight < 0:
+            logger.warning("[%s] Invalid weight %r for burn message %r; using 1.0", coll_name, weight, item["message"])
+            weight = 1.0
+        messages.append(item["message"])
+        weights.append(weight)
+
+    if messages and sum(weights) <= 0:
+        logger.warning("[%s] burn_messages weights add up to 0; using the default burn message.", coll_name)
+        messages = []
+    if not messages:
+        messages = [item["message"] for item in DEFAULT_BURN_MESSAGES]
+        weights = [item["weight"] for item in DEFAULT_BURN_MESSAGES]
+    return messages, list(itertools.accumulate(weights))
+
+PROCESSED_COLLECTIONS = {}  # contract -> SimpleNamespace from build_collection_settings
+
+logger.debug("Initializing known IDs and timestamps for each collection...")
 for coll in COLLECTIONS:
     contract = coll["contract_address"].lower()
-    print(f"[DEBUG] Initializing for contract {contract} ({coll.get('name', '')})")
-    known_sales[contract] = load_ids(get_sales_file(contract))
-    known_mints[contract] = load_ids(get_mints_file(contract))
-    known_burns[contract] = load_ids(get_burns_file(contract))
-    token_id_cooldowns[contract] = {}  # Initialize empty cooldown dict for this collection
+    logger.debug("Initializing for contract %s (%s)", contract, coll.get('name', ''))
+    PROCESSED_COLLECTIONS[contract] = build_collection_settings(coll)
+    load_state(contract)
 
     now_ts = int(time.time())
     last_check_sales_timestamp[contract] = now_ts
     last_check_activity_timestamp[contract] = now_ts
     last_check_opensea_timestamp[contract] = now_ts
 
-print("[DEBUG] Initialization complete.")
+logger.debug("Initialization complete.")
 
 #################################
 # Discord Bot
@@ -185,50 +534,150 @@ print("[DEBUG] Initialization complete.")
 intents = discord.Intents.default()
 intents.message_content = True
 
-bot = discord.Client(intents=intents)
+class SalesBotClient(discord.Client):
+    async def setup_hook(self):
+        # systemd stops the service with SIGTERM, which (unlike Ctrl+C) would otherwise kill
+        # the process outright; route it through close() so queued posts and state are saved
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGTERM, self.request_shutdown)
+        except NotImplementedError:
+            # Windows event loops don't support add_signal_handler
+            signal.signal(signal.SIGTERM, lambda signum, frame: loop.call_soon_threadsafe(self.request_shutdown))
+
+    def request_shutdown(self):
+        logger.info("Received SIGTERM, shutting down...")
+        # Keep a reference so the task isn't garbage collected before it finishes
+        self.shutdown_task = asyncio.create_task(self.close())
+
+    async def close(self):
+        # close() can be called more than once; only drain the first time
+        if self.is_closed():
+            return
+        # Stop polling so nothing new is queued, then send what's queued while still connected
+        if poll_task is not None:
+            poll_task.cancel()
+        await drain_send_queues()
+        await super().close()
+        # The shared HTTP session lives for the whole process; close it on shutdown
+        if http_session is not None and not http_session.closed:
+            await http_session.close()
+
+bot = SalesBotClient(intents=intents)
+
+CHANNEL_CACHE = {}  # channel id -> discord channel, filled in on_ready()
+
+def refresh_channel_cache():
+    CHANNEL_CACHE.clear()
+    for cfg in PROCESSED_COLLECTIONS.values():
+        for channel_id in (cfg.sales_channel_id, cfg.mint_channel_id, cfg.burn_channel_id):
+            if channel_id:
+                channel = bot.get_channel(channel_id)
+                if channel:
+                    CHANNEL_CACHE[channel_id] = channel
+    logger.debug("Cached %s Discord channels.", len(CHANNEL_CACHE))
+
+def get_cached_channel(channel_id):
+    if not channel_id:
+        return None
+    channel = CHANNEL_CACHE.get(channel_id)
+    if channel is None:
+        # Not visible when on_ready ran; try again so it's picked up once available
+        channel = bot.get_channel(channel_id)
+        if channel:
+            CHANNEL_CACHE[channel_id] = channel
+    return channel
 
 #################################
 # Task Loop
 #################################
-@tasks.loop(seconds=60)
+FAILED_CHECK_RETRY_DELAY = 60  # Seconds before retrying a check that raised
+
+# Earliest time a failed check may run again. The last-check timestamp is left as it was,
+# so the retry still covers everything since the last successful check.
+activity_retry_at = {}  # contract -> unix timestamp
+opensea_retry_at = {}  # contract -> unix timestamp
+
+def activity_check_due_at(cfg):
+    return max(last_check_activity_timestamp[cfg.contract] + cfg.poll_interval, activity_retry_at.get(cfg.contract, 0))
+
+def opensea_check_due_at(cfg):
+    return max(last_check_opensea_timestamp[cfg.contract] + cfg.poll_interval, opensea_retry_at.get(cfg.contract, 0))
+
+def seconds_until_next_check():
+    """Seconds until the earliest collection is due for an activity or OpenSea check."""
+    due_times = []
+    for cfg in PROCESSED_COLLECTIONS.values():
+        due_times.append(activity_check_due_at(cfg))
+        if OPENSEA_ENABLED and cfg.opensea_slug:
+            due_times.append(opensea_check_due_at(cfg))
+    if not due_times:
+        return 60
+    return max(1, min(due_times) - time.time())
+
+async def poll_collections_loop():
+    """
+    Run check_all_collections, then sleep exactly until the next collection is due,
+    so short poll_intervals wake on time and a slow tick never stacks another one behind it.
+    """
+    while not bot.is_closed():
+        try:
+            await check_all_collections()
+        except Exception as e:
+            logger.warning("Error in check_all_collections(): %s", e)
+        sleep_seconds = seconds_until_next_check()
+        logger.debug("Next collection check in %.0fs", sleep_seconds)
+        await asyncio.sleep(sleep_seconds)
+
 async def check_all_collections():
     current_ts = int(time.time())
-    print("[DEBUG] check_all_collections() - Start checking each collection...")
+    logger.debug("check_all_collections() - Start checking each collection...")
 
-    for coll in COLLECTIONS:
-        coll_name = coll.get("name", "Unknown")
-        contract = coll["contract_address"].lower()
+    # Gather every due check so collections poll concurrently instead of one after another
+    tasks_to_run = []
+    task_info = []  # (label, retry_at dict, contract) per task
 
-        # default poll_interval to 300 (5 mins) if not specified
-        poll_interval = coll.get("poll_interval", 300)
+    for cfg in PROCESSED_COLLECTIONS.values():
+        coll_name = cfg.name
+        contract = cfg.contract
 
         # Check Activities (sales, mints, burns) if poll_interval has passed
-        if current_ts - last_check_activity_timestamp[contract] >= poll_interval:
-            print(f"[DEBUG] -> Checking Activities for: {coll_name}")
-            await check_activities_for_collection(coll)
+        if current_ts >= activity_check_due_at(cfg):
+            logger.debug("-> Checking Activities for: %s", coll_name)
+            tasks_to_run.append(check_activities_for_collection(cfg))
+            task_info.append((f"{coll_name} activities", activity_retry_at, contract))
             # Timestamp is updated inside check_activities_for_collection
 
         # Check OpenSea sales if enabled, poll_interval has passed, and collection has opensea_collection_slug
-        if OPENSEA_ENABLED and current_ts - last_check_opensea_timestamp[contract] >= poll_interval:
-            if coll.get("opensea_collection_slug"):
-                print(f"[DEBUG] -> Checking OpenSea Sales for: {coll_name}")
-                await check_opensea_sales_for_collection(coll)
+        if OPENSEA_ENABLED and current_ts >= opensea_check_due_at(cfg):
+            if cfg.opensea_slug:
+                logger.debug("-> Checking OpenSea Sales for: %s", coll_name)
+                tasks_to_run.append(check_opensea_sales_for_collection(cfg))
+                task_info.append((f"{coll_name} OpenSea sales", opensea_retry_at, contract))
                 # Timestamp is updated inside check_opensea_sales_for_collection
 
-    print("[DEBUG] check_all_collections() - Finished checking all collections.")
+    results = await asyncio.gather(*tasks_to_run, return_exceptions=True)
+    for (label, retry_at, contract), result in zip(task_info, results):
+        if isinstance(result, Exception):
+            # The last-check timestamp wasn't updated, so without a delay this check
+            # would be due again immediately and retried every second until it succeeds
+            logger.warning("Error while checking %s (retrying in %ss): %s", label, FAILED_CHECK_RETRY_DELAY, result)
+            retry_at[contract] = int(time.time()) + FAILED_CHECK_RETRY_DELAY
 
-async def check_activities_for_collection(coll_config):
+    logger.debug("check_all_collections() - Finished checking all collections.")
+
+async def check_activities_for_collection(cfg):
     """
     Check activities (sales, mints, burns) for a collection using Magic Eden API.
     This replaces the old check_sales_for_collection and check_activity_for_collection.
     """
-    contract = coll_config["contract_address"].lower()
-    coll_name = coll_config.get("name", "Unknown")
-    chain = coll_config.get("chain", "ethereum")
+    contract = cfg.contract
+    coll_name = cfg.name
+    chain = cfg.chain
 
     # Get the last check timestamp (use activity timestamp for unified checking)
     start_ts = last_check_activity_timestamp.get(contract, int(time.time()))
-    limit = coll_config.get("activity_limit", 50)
+    limit = cfg.activity_limit
 
     # Build Magic Eden API URL
     base_url = "https://api-mainnet.magiceden.dev/v4/activity/nft"
@@ -244,45 +693,61 @@ async def check_activities_for_collection(coll_config):
         f"&sortDir=desc"
     )
 
-    print(f"[DEBUG][{coll_name}] check_activities_for_collection() - URL: {url}")
+    logger.debug("[%s] check_activities_for_collection() - URL: %s", coll_name, url)
     activity_data = await fetch_data(url)
     activities = activity_data.get("activities", [])
-    print(f"[DEBUG][{coll_name}] Fetched {len(activities)} activities (before filtering).")
+    logger.debug("[%s] Fetched %s activities (before filtering).", coll_name, len(activities))
 
     # Filter by timestamp and reverse to process oldest first
-    start_iso = unix_to_iso(start_ts)
+    # Magic Eden timestamps are ISO 8601 UTC strings, which sort in time order, so format
+    # start_ts once per batch and compare strings instead of parsing every activity.
+    # The cutoff has no fractional seconds or "Z", so "...:56.789Z" still sorts at or after "...:56".
+    start_iso = unix_to_iso(start_ts).removesuffix("Z")
     filtered_activities = [act for act in activities if act.get("timestamp", "") >= start_iso]
     filtered_activities.reverse()
 
-    print(f"[DEBUG][{coll_name}] Processing {len(filtered_activities)} activities after timestamp filter.")
-
-    # Process different activity types
-    await process_trade_activities(filtered_activities, coll_config)
-    await process_mint_activities(filtered_activities, coll_config)
-    await process_burn_activities(filtered_activities, coll_config)
+    logger.debug("[%s] Processing %s activities after timestamp filter.", coll_name, len(filtered_activities))
+
+    # Split activities by type in a single pass
+    trades, mints, burns = [], [], []
+    for act in filtered_activities:
+        activity_type = act.get("activityType")
+        if activity_type == "TRADE":
+            trades.append(act)
+        elif activity_type == "MINT":
+            mints.append(act)
+        elif activity_type == "BURN":
+            burns.append(act)
+
+    # Sales, mints and burns are tracked separately, so process them concurrently
+    await asyncio.gather(
+        process_trade_activities(trades, cfg),
+        process_mint_activities(mints, cfg),
+        process_burn_activities(burns, cfg),
+    )
 
     # Update last check timestamp
     last_check_activity_timestamp[contract] = int(time.time())
 
-async def process_trade_activities(activities, coll_config):
-    """Process TRADE activities (sales)."""
-    contract = coll_config["contract_address"].lower()
-    coll_name = coll_config.get("name", "Unknown")
-    zero_addr = coll_config.get("zero_address", "0x0000000000000000000000000000000000000000").lower()
-    sales_channel_id = coll_config.get("discord_sales_channel_id", 0)
-    sales_channel = bot.get_channel(sales_channel_id) if sales_channel_id else None
+async def process_trade_activities(activities, cfg):
+    """Process TRADE activities (sales). Expects only TRADE activities."""
+    contract = cfg.contract
+    coll_name = cfg.name
+    zero_addr = cfg.zero_addr
+    sales_channel_id = cfg.sales_channel_id
+    sales_channel = get_cached_channel(sales_channel_id)
 
-    # Get cooldown period in minutes, default to 60 if not specified
-    cooldown_minutes = coll_config.get("id_cooldown", 60)
-    cooldown_seconds = cooldown_minutes * 60
+    cooldown_seconds = cfg.cooldown_seconds
+
+    # All events in one batch share the same clock reading for cooldown purposes
+    current_time = int(time.time())
+    purge_expired_cooldowns(contract, current_time, cooldown_seconds)
 
     new_count = 0
     new_posted = False
+    new_sales = []
 
     for act in activities:
-        if act.get("activityType") != "TRADE":
-            continue
-
         from_addr = act.get("fromAddress", "").lower()
         if from_addr == zero_addr:
             continue
@@ -292,162 +757,149 @@ async def process_trade_activities(activities, coll_config):
         sale_id = f"{token_id}-{tx_hash}"
 
         # Check if token ID is in cooldown
-        current_time = int(time.time())
-        last_sale_time = token_id_cooldowns[contract].get(token_id, 0)
-        if current_time - last_sale_time < cooldown_seconds:
-            print(f"[DEBUG][{coll_name}] Token ID {token_id} is in cooldown, skipping sale")
+        if token_in_cooldown(contract, token_id, current_time, cooldown_seconds):
+            logger.debug("[%s] Token ID %s is in cooldown, skipping sale", coll_name, token_id)
             continue
 
         if sale_id not in known_sales[contract]:
-            known_sales[contract].append(sale_id)
-            max_known_sales = coll_config.get("max_known_sales", 50)
-            if len(known_sales[contract]) > max_known_sales:
-                known_sales[contract].pop(0)
+            remember_id(known_sales[contract], sale_id, cfg.max_known_sales)
 
             # Update token ID cooldown timestamp
-            token_id_cooldowns[contract][token_id] = current_time
+            start_token_cooldown(contract, token_id, current_time)
 
-            if sales_channel:
-                embed = await build_sale_embed_me(act, coll_config)
-                try:
-                    await sales_channel.send(embed=embed)
-                except Exception as e:
-                    print(f"[DEBUG][{coll_name}] Error sending sale embed: {e}")
+            new_sales.append(act)
 
             new_count += 1
             new_posted = True
 
-    print(f"[DEBUG][{coll_name}] New sales posted: {new_count}")
+    if sales_channel and new_sales:
+        embeds = await build_embeds(build_sale_embed_me, new_sales, cfg, "sale")
+        queue_embeds(sales_channel, embeds, coll_name, "sale")
+
+    logger.debug("[%s] New sales posted: %s", coll_name, new_count)
     if new_posted:
-        save_ids(known_sales[contract], get_sales_file(contract))
+        mark_state_dirty(contract)
 
-async def process_mint_activities(activities, coll_config):
-    """Process MINT activities."""
-    contract = coll_config["contract_address"].lower()
-    coll_name = coll_config.get("name", "Unknown")
-    mint_channel_id = coll_config.get("discord_mint_channel_id", 0)
-    mint_channel = bot.get_channel(mint_channel_id) if mint_channel_id else None
+async def process_mint_activities(activities, cfg):
+    """Process MINT activities. Expects only MINT activities."""
+    contract = cfg.contract
+    coll_name = cfg.name
+    mint_channel_id = cfg.mint_channel_id
+    mint_channel = get_cached_channel(mint_channel_id)
 
     new_count = 0
     new_posted = False
+    new_mints = []
 
     for act in activities:
-        if act.get("activityType") != "MINT":
-            continue
-
         token_id = act.get("asset", {}).get("tokenId", "???")
         tx_hash = act.get("transactionInfo", {}).get("transactionId", "noTxHash")
         mint_id = f"{token_id}-{tx_hash}"
 
         if mint_id not in known_mints[contract]:
-            known_mints[contract].append(mint_id)
-            max_mints = coll_config.get("max_known_mints", 100)
-            if len(known_mints[contract]) > max_mints:
-                known_mints[contract].pop(0)
-
-            if mint_channel:
-                try:
-                    embed = await build_mint_embed_me(act, coll_config)
-                    await mint_channel.send(embed=embed)
-                except Exception as e:
-                    print(f"[DEBUG][{coll_name}] Error sending mint embed: {e}")
+            remember_id(known_mints[contract], mint_id, cfg.max_known_mints)
+
+            new_mints.append(act)
 
             new_count += 1
             new_posted = True
 
-    print(f"[DEBUG][{coll_name}] New mints posted: {new_count}")
+    if mint_channel and new_mints:
+        embeds = await build_embeds(build_mint_embed_me, new_mints, cfg, "mint")
+        queue_embeds(mint_channel, embeds, coll_name, "mint")
+
+    logger.debug("[%s] New mints posted: %s", coll_name, new_count)
     if new_posted:
-        save_ids(known_mints[contract], get_mints_file(contract))
+        mark_state_dirty(contract)
 
-async def process_burn_activities(activities, coll_config):
-    """Process BURN activities."""
-    contract = coll_config["contract_address"].lower()
-    coll_name = coll_config.get("name", "Unknown")
-    burn_channel_id = coll_config.get("discord_burn_channel_id", 0)
-    burn_channel = bot.get_channel(burn_channel_id) if burn_channel_id else None
+async def process_burn_activities(activities, cfg):
+    """Process BURN activities. Expects only BURN activities."""
+    contract = cfg.contract
+    coll_name = cfg.name
+    burn_channel_id = cfg.burn_channel_id
+    burn_channel = get_cached_channel(burn_channel_id)
 
     new_count = 0
     new_posted = False
+    new_burns = []
 
     for act in activities:
-        if act.get("activityType") != "BURN":
-            continue
-
         token_id = act.get("asset", {}).get("tokenId", "???")
         tx_hash = act.get("transactionInfo", {}).get("transactionId", "noTxHash")
         burn_id = f"{token_id}-{tx_hash}"
 
         if burn_id not in known_burns[contract]:
-            known_burns[contract].append(burn_id)
-            max_burns = coll_config.get("max_known_burns", 100)
-            if len(known_burns[contract]) > max_burns:
-                known_burns[contract].pop(0)
-
-            if burn_channel:
-                try:
-                    embed = await build_burn_embed_me(act, coll_config)
-                    await burn_channel.send(embed=embed)
-                except Exception as e:
-                    print(f"[DEBUG][{coll_name}] Error sending burn embed: {e}")
+            remember_id(known_burns[contract], burn_id, cfg.max_known_burns)
+
+            new_burns.append(act)
 
             new_count += 1
             new_posted = True
 
-    print(f"[DEBUG][{coll_name}] New burns posted: {new_count}")
+    if burn_channel and new_burns:
+        embeds = await build_embeds(build_burn_embed_me, new_burns, cfg, "burn")
+        queue_embeds(burn_channel, embeds, coll_name, "burn")
+
+    logger.debug("[%s] New burns posted: %s", coll_name, new_count)
     if new_posted:
-        save_ids(known_burns[contract], get_burns_file(contract))
+        mark_state_dirty(contract)
 
-async def check_opensea_sales_for_collection(coll_config):
+async def check_opensea_sales_for_collection(cfg):
     """Check OpenSea for sales events. Only tracks sales, not mints/burns."""
-    contract = coll_config["contract_address"].lower()
-    coll_name = coll_config.get("name", "Unknown")
+    contract = cfg.contract
+    coll_name = cfg.name
 
     # Skip if no OpenSea slug configured
-    opensea_slug = coll_config.get("opensea_collection_slug")
+    opensea_slug = cfg.opensea_slug
     if not opensea_slug:
         return
 
     start_ts = last_check_opensea_timestamp.get(contract, int(time.time()))
-    limit = coll_config.get("sales_limit", 50)
+    limit = cfg.sales_limit
 
     # Build OpenSea API URL
     base_url = "https://api.opensea.io/api/v2/events/collection"
     url = f"{base_url}/{opensea_slug}?limit={limit}&event_type=sale"
 
-    print(f"[DEBUG][{coll_name}] check_opensea_sales_for_collection() - URL: {url}")
+    logger.debug("[%s] check_opensea_sales_for_collection() - URL: %s", coll_name, url)
 
-    # Fetch with OpenSea API key
-    headers = {"accept": "application/json", "x-api-key": OPENSEA_API_KEY}
-    opensea_data = await fetch_data_with_headers(url, headers)
+    # Fetch with the next OpenSea API key in the rotation, within that key's own limits
+    api_key = next(opensea_key_cycle)
+    headers = {"accept": "application/json", "x-api-key": api_key}
+    async with opensea_key_semaphores[api_key]:
+        opensea_data = await fetch_data_with_headers(url, headers, limiter=opensea_key_limiters[api_key])
 
     events = opensea_data.get("asset_events", [])
-    print(f"[DEBUG][{coll_name}] Fetched {len(events)} OpenSea events (before filtering).")
+    logger.debug("[%s] Fetched %s OpenSea events (before filtering).", coll_name, len(events))
 
     # Filter by timestamp and reverse to process oldest first
     filtered_events = [evt for evt in events if evt.get("event_timestamp", 0) >= start_ts]
     filtered_events.reverse()
 
-    print(f"[DEBUG][{coll_name}] Processing {len(filtered_events)} OpenSea sales after timestamp filter.")
+    logger.debug("[%s] Processing %s OpenSea sales after timestamp filter.", coll_name, len(filtered_events))
 
-    await process_opensea_sale_events(filtered_events, coll_config)
+    await process_opensea_sale_events(filtered_events, cfg)
 
     # Update last check timestamp
     last_check_opensea_timestamp[contract] = int(time.time())
 
-async def process_opensea_sale_events(events, coll_config):
+async def process_opensea_sale_events(events, cfg):
     """Process OpenSea sale events (event_type=sale)."""
-    contract = coll_config["contract_address"].lower()
-    coll_name = coll_config.get("name", "Unknown")
-    zero_addr = coll_config.get("zero_address", "0x0000000000000000000000000000000000000000").lower()
-    sales_channel_id = coll_config.get("discord_sales_channel_id", 0)
-    sales_channel = bot.get_channel(sales_channel_id) if sales_channel_id else None
+    contract = cfg.contract
+    coll_name = cfg.name
+    zero_addr = cfg.zero_addr
+    sales_channel_id = cfg.sales_channel_id
+    sales_channel = get_cached_channel(sales_channel_id)
 
-    # Get cooldown period
-    cooldown_minutes = coll_config.get("id_cooldown", 60)
-    cooldown_seconds = cooldown_minutes * 60
+    cooldown_seconds = cfg.cooldown_seconds
+
+    # All events in one batch share the same clock reading for cooldown purposes
+    current_time = int(time.time())
+    purge_expired_cooldowns(contract, current_time, cooldown_seconds)
 
     new_count = 0
     new_posted = False
+    new_sales = []
 
     for evt in events:
         # Extract sale data from OpenSea format
@@ -469,115 +921,273 @@ async def process_opensea_sale_events(events, coll_config):
             continue
 
         # Check if token ID is in cooldown
-        current_time = int(time.time())
-        last_sale_time = token_id_cooldowns[contract].get(token_id, 0)
-        if current_time - last_sale_time < cooldown_seconds:
-            print(f"[DEBUG][{coll_name}] Token ID {token_id} is in cooldown, skipping OpenSea sale")
+        if token_in_cooldown(contract, token_id, current_time, cooldown_seconds):
+            logger.debug("[%s] Token ID %s is in cooldown, skipping OpenSea sale", coll_name, token_id)
             continue
 
         if sale_id not in known_sales[contract]:
-            known_sales[contract].append(sale_id)
-            max_known_sales = coll_config.get("max_known_sales", 50)
-            if len(known_sales[contract]) > max_known_sales:
-                known_sales[contract].pop(0)
+            remember_id(known_sales[contract], sale_id, cfg.max_known_sales)
 
             # Update token ID cooldown timestamp
-            token_id_cooldowns[contract][token_id] = current_time
+            start_token_cooldown(contract, token_id, current_time)
 
-            if sales_channel:
-                embed = await build_opensea_sale_embed(evt, coll_config)
-                try:
-                    await sales_channel.send(embed=embed)
-                except Exception as e:
-                    print(f"[DEBUG][{coll_name}] Error sending OpenSea sale embed: {e}")
+            new_sales.append(evt)
 
             new_count += 1
             new_posted = True
 
-    print(f"[DEBUG][{coll_name}] New OpenSea sales posted: {new_count}")
+    if sales_channel and new_sales:
+        embeds = await build_embeds(build_opensea_sale_embed, new_sales, cfg, "OpenSea sale")
+        queue_embeds(sales_channel, embeds, coll_name, "OpenSea sale")
+
+    logger.debug("[%s] New OpenSea sales posted: %s", coll_name, new_count)
     if new_posted:
-        save_ids(known_sales[contract], get_sales_file(contract))
+        mark_state_dirty(contract)
 
 #################################
-# Async-Safe Fetch
+# Discord Posting
 #################################
-def sync_fetch_data(url):
-    # Magic Eden API doesn't require authentication
-    headers = {"accept": "*/*"}
-    start_time = time.time()
-    print(f"[DEBUG] (sync) sync_fetch_data() - Starting request to: {url[:200]}...")
+# Seconds between posts to one channel. 1.2s allows at most 5 posts in any 5s window,
+# which is Discord's per-channel limit, even when a large batch is queued at once.
+DISCORD_MIN_SEND_INTERVAL = 1.2
+DISCORD_SHUTDOWN_DRAIN_TIMEOUT = 60  # Seconds to wait at shutdown for queued posts to go out
+
+channel_send_queues = {}  # channel id -> asyncio.Queue of (embed, coll_name, kind)
+channel_send_workers = {}  # channel id -> asyncio.Task draining that queue
+
+async def build_embeds(builder, items, cfg, kind):
+    """Build embeds for all items concurrently, keeping their order and skipping failures."""
+    coll_name = cfg.name
+    results = await asyncio.gather(*(builder(item, cfg) for item in items), return_exceptions=True)
+    embeds = []
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning("[%s] Error building %s embed: %s", coll_name, kind, result)
+        else:
+            embeds.append(result)
+    return embeds
 
+def queue_embeds(channel, embeds, coll_name, kind):
+    """
+    Hand embeds to the channel's send queue. One worker per channel posts them
+    in order, so the processors don't wait on Discord and posts are never reordered.
+    """
+    send_queue = channel_send_queues.get(channel.id)
+    if send_queue is None:
+        send_queue = channel_send_queues[channel.id] = asyncio.Queue()
+        channel_send_workers[channel.id] = asyncio.create_task(channel_send_worker(channel, send_queue))
+    for embed in embeds:
+        send_queue.put_nowait((embed, coll_name, kind))
+
+async def channel_send_worker(channel, send_queue):
+    last_send = 0.0
+    while True:
+        embed, coll_name, kind = await send_queue.get()
+        try:
+            wait = last_send + DISCORD_MIN_SEND_INTERVAL - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            last_send = time.monotonic()
+            await channel.send(embed=embed)
+        except Exception as e:
+            logger.warning("[%s] Error sending %s embed: %s", coll_name, kind, e)
+        finally:
+            send_queue.task_done()
+
+async def drain_send_queues():
+    """
+    Wait up to DISCORD_SHUTDOWN_DRAIN_TIMEOUT for every queued post to be sent, then
+    stop the send workers. Runs at shutdown before the final state flush, because
+    the IDs of queued posts are already remembered and would never be posted again.
+    """
+    queued = sum(send_queue.qsize() for send_queue in channel_send_queues.values())
+    if queued:
+        logger.info("Sending %s queued Discord posts before shutting down...", queued)
     try:
-        r = requests.get(url, headers=headers, timeout=15)
-        r.raise_for_status()
-        elapsed = time.time() - start_time
-        print(f"[DEBUG] (sync) sync_fetch_data() - Success. Status: {r.status_code}. Time: {elapsed:.2f}s")
-        return r.json()
-    except Exception as e:
-        elapsed = time.time() - start_time
-        print(f"[DEBUG] Error fetching data from {url}: {e} (Time: {elapsed:.2f}s)")
-        return {}
+        await asyncio.wait_for(
+            asyncio.gather(*(send_queue.join() for send_queue in channel_send_queues.values())),
+            DISCORD_SHUTDOWN_DRAIN_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        unsent = sum(send_queue.qsize() for send_queue in channel_send_queues.values())
+        logger.warning("Shutting down with %s Discord posts still unsent.", unsent)
+    for worker in channel_send_workers.values():
+        worker.cancel()
+
+#################################
+# Async HTTP Fetch
+#################################
+# Shared aiohttp session, created in on_ready() so it is bound to the bot's event loop.
+# Reusing one session keeps connections alive across polls instead of
+# paying a new TCP/TLS handshake for every request.
+http_session: aiohttp.ClientSession | None = None
+
+HTTP_TIMEOUT = 15  # Default total timeout (seconds) for every request on the shared session
+
+def create_http_session():
+    connector = aiohttp.TCPConnector(limit=64, limit_per_host=8, ttl_dns_cache=300)
+    return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT))
+
+class AsyncLimiter:
+    """
+    Leaky-bucket rate limiter: allows at most max_rate acquisitions per
+    time_period seconds, smoothing bursts from concurrent callers.
+    """
+    def __init__(self, max_rate, time_period=60):
+        self.max_rate = max_rate
+        self.time_period = time_period
+        self._level = 0.0
+        self._last_check = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _leak(self):
+        now = time.monotonic()
+        elapsed = now - self._last_check
+        self._level = max(0.0, self._level - elapsed * self.max_rate / self.time_period)
+        self._last_check = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._leak()
+            while self._level + 1 > self.max_rate:
+                await asyncio.sleep((self._level + 1 - self.max_rate) * self.time_period / self.max_rate)
+                self._leak()
+            self._level += 1
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return None
+
+# One limiter per API host (requests per 60 seconds)
+magiceden_limiter = AsyncLimiter(120, 60)
+coinbase_limiter = AsyncLimiter(30, 60)
+ens_limiter = AsyncLimiter(60, 60)
+
+HTTP_MAX_RETRIES = 4  # Up to 5 attempts in total
+HTTP_MAX_RETRY_AFTER = 60  # Never wait longer than this on a single Retry-After
+HTTP_MAX_CONCURRENCY = 16  # Cap on requests in flight at once across all collections
+
+http_semaphore = asyncio.Semaphore(HTTP_MAX_CONCURRENCY)
+
+# OpenSea quotas are per API key, so each key gets its own limiter and concurrency cap
+# and requests rotate through the keys in order
+OPENSEA_KEY_MAX_CONCURRENCY = 4
+opensea_key_cycle = itertools.cycle(OPENSEA_API_KEYS)
+opensea_key_limiters = {key: AsyncLimiter(60, 60) for key in OPENSEA_API_KEYS}
+opensea_key_semaphores = {key: asyncio.Semaphore(OPENSEA_KEY_MAX_CONCURRENCY) for key in OPENSEA_API_KEYS}
+
+def retry_delay(response, attempt):
+    """
+    Seconds to wait before retrying: the server's Retry-After when it gives one in
+    seconds, otherwise exponential backoff with jitter so concurrent callers spread out.
+    """
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return min(max(0.0, float(retry_after)), HTTP_MAX_RETRY_AFTER)
+        except ValueError:
+            pass  # HTTP-date form; fall back to backoff
+    return 2 ** attempt + random.uniform(0, 1)
+
+async def get_json(url, headers=None, limiter=None, timeout=None):
+    """
+    GET url on the shared session and return the decoded JSON body.
+    Retries 429/5xx responses with exponential backoff; raises on any other failure.
+    """
+    for attempt in range(HTTP_MAX_RETRIES + 1):
+        if limiter:
+            await limiter.acquire()
+        # timeout overrides the session's HTTP_TIMEOUT for quick lookups (ENS, prices, metadata).
+        # Only pass it when set: timeout=None would disable the session default entirely.
+        request_kwargs = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        async with http_semaphore:
+            async with http_session.get(url, headers=headers, **request_kwargs) as r:
+                if (r.status == 429 or r.status >= 500) and attempt < HTTP_MAX_RETRIES:
+                    backoff = retry_delay(r, attempt)
+                    logger.warning("get_json() - Status %s from %.200s, retrying in %.1fs", r.status, url, backoff)
+                else:
+                    r.raise_for_status()
+                    return orjson.loads(await r.read())
+        await asyncio.sleep(backoff)
+
+async def single_flight(inflight, key, coro_factory):
+    """
+    Coalesce concurrent requests for the same key: the first caller starts
+    coro_factory() as a task stored in inflight[key], later callers await that
+    same task, and the entry is removed once it finishes.
+    """
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(coro_factory())
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+    # Shield so one cancelled caller doesn't cancel the shared task for everyone else
+    return await asyncio.shield(task)
 
 async def fetch_data(url):
-    """Run the blocking sync_fetch_data in a separate thread via asyncio.to_thread()."""
-    return await asyncio.to_thread(sync_fetch_data, url)
+    # Magic Eden API doesn't require authentication
+    headers = {"accept": "*/*"}
+    return await fetch_data_with_headers(url, headers, limiter=magiceden_limiter)
 
-def sync_fetch_data_with_headers(url, headers):
-    """Fetch data with custom headers (for OpenSea API)."""
+async def fetch_data_with_headers(url, headers, limiter=None):
+    """Fetch JSON from url with custom headers (used directly for OpenSea API)."""
     start_time = time.time()
-    print(f"[DEBUG] (sync) sync_fetch_data_with_headers() - Starting request to: {url[:200]}...")
+    logger.debug("fetch_data_with_headers() - Starting request to: %.200s...", url)
 
     try:
-        r = requests.get(url, headers=headers, timeout=15)
-        r.raise_for_status()
+        data = await get_json(url, headers=headers, limiter=limiter)
         elapsed = time.time() - start_time
-        print(f"[DEBUG] (sync) sync_fetch_data_with_headers() - Success. Status: {r.status_code}. Time: {elapsed:.2f}s")
-        return r.json()
+        logger.debug("fetch_data_with_headers() - Success. Time: %.2fs", elapsed)
+        return data
     except Exception as e:
         elapsed = time.time() - start_time
-        print(f"[DEBUG] Error fetching data from {url}: {e} (Time: {elapsed:.2f}s)")
+        logger.warning("Error fetching data from %s: %s (Time: %.2fs)", url, e, elapsed)
         return {}
 
-async def fetch_data_with_headers(url, headers):
-    """Run sync_fetch_data_with_headers in a separate thread."""
-    return await asyncio.to_thread(sync_fetch_data_with_headers, url, headers)
+ETH_PRICE_TTL = 60  # Seconds to reuse a fetched ETH price
+eth_price_cache = (0.0, 0.0)  # (price, fetched_at)
+eth_price_inflight = {}  # "ETH-USD" -> asyncio.Task of a price fetch in progress
 
-def sync_fetch_eth_price():
+async def fetch_eth_price():
+    """
+    Return the ETH/USD spot price, reusing it for ETH_PRICE_TTL seconds and
+    sharing one request between concurrent callers.
+    """
+    global eth_price_cache
+    price, fetched_at = eth_price_cache
+    if price > 0 and time.time() - fetched_at < ETH_PRICE_TTL:
+        return price
+
+    price = await single_flight(eth_price_inflight, "ETH-USD", fetch_eth_price_from_coinbase)
+    if price > 0:
+        eth_price_cache = (price, time.time())
+    return price
+
+async def fetch_eth_price_from_coinbase():
     """Fetch current ETH/USD spot price from Coinbase."""
     url = "https://api.coinbase.com/v2/prices/ETH-USD/spot"
     try:
-        resp = requests.get(url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        data = await get_json(url, limiter=coinbase_limiter, timeout=10)
         price = float(data.get("data", {}).get("amount", 0))
-        print(f"[DEBUG] Fetched ETH price: ${price:,.2f}")
+        logger.debug("Fetched ETH price: $%.2f", price)
         return price
     except Exception as e:
-        print(f"[DEBUG] Error fetching ETH price from Coinbase: {e}")
+        logger.warning("Error fetching ETH price from Coinbase: %s", e)
         return 0.0
 
-async def fetch_eth_price():
-    """Async wrapper for fetching ETH price."""
-    return await asyncio.to_thread(sync_fetch_eth_price)
-
-def weighted_burn_message(burn_list, token_name):
-    r = random.random()
-    cumulative = 0.0
-    for item in burn_list:
-        weight = item["weight"]
-        msg = item["message"]
-        cumulative += weight
-        if r < cumulative:
-            return msg.replace("{tokenName}", token_name)
-    last_msg = burn_list[-1]["message"]
-    return last_msg.replace("{tokenName}", token_name)
+def weighted_burn_message(messages, cum_weights, token_name):
+    # cum_weights lets random.choices bisect directly instead of summing the weights on every call
+    msg = random.choices(messages, cum_weights=cum_weights)[0]
+    return msg.replace("{tokenName}", token_name)
 
 #################################
 # Magic Eden Embed Builders
 #################################
-async def build_sale_embed_me(activity, coll_config):
+async def build_sale_embed_me(activity, cfg):
     """Build Discord embed for Magic Eden TRADE activity."""
-    print(f"[DEBUG] build_sale_embed_me() - Building embed for activity ID: {activity.get('activityId')}")
+    logger.debug("build_sale_embed_me() - Building embed for activity ID: %s", activity.get('activityId'))
 
     asset = activity.get("asset", {})
     token_name = asset.get("name", "Unknown Token")
@@ -601,13 +1211,16 @@ async def build_sale_embed_me(activity, coll_config):
 
     seller_address = activity.get("fromAddress", "")
     buyer_address = activity.get("toAddress", "")
-    seller_display = await get_ens_or_short(seller_address, coll_config.get("chain", "ethereum"))
-    buyer_display = await get_ens_or_short(buyer_address, coll_config.get("chain", "ethereum"))
+    chain = cfg.chain
+    # Resolve seller and buyer concurrently
+    seller_display, buyer_display = await asyncio.gather(
+        get_ens_or_short(seller_address, chain),
+        get_ens_or_short(buyer_address, chain),
+    )
 
     tx_info = activity.get("transactionInfo", {})
     tx_hash = tx_info.get("transactionId", "noTxHash")
-    transaction_link_base = coll_config.get("transaction_link_base", "https://abscan.org/tx/")
-    transaction_link = f"{transaction_link_base}{tx_hash}"
+    transaction_link = f"{cfg.tx_link_base}{tx_hash}"
 
     embed = discord.Embed(
         title=f"{token_name} has been sold!!!",
@@ -628,9 +1241,9 @@ async def build_sale_embed_me(activity, coll_config):
     embed.set_footer(text="Powered by Oekaki.io")
     return embed
 
-async def build_mint_embed_me(activity, coll_config):
+async def build_mint_embed_me(activity, cfg):
     """Build Discord embed for Magic Eden MINT activity."""
-    print(f"[DEBUG] build_mint_embed_me() - Building embed for activity: {activity.get('activityId')}")
+    logger.debug("build_mint_embed_me() - Building embed for activity: %s", activity.get('activityId'))
 
     asset = activity.get("asset", {})
     token_id = asset.get("tokenId", "???")
@@ -638,23 +1251,18 @@ async def build_mint_embed_me(activity, coll_config):
 
     # If the token name is missing, "None", or "???", fallback to "{CollectionName} #{TokenId}"
     if not token_name or token_name.lower() in ("none", "???"):
-        token_name = f"{coll_config.get('name', 'Unknown Collection')} #{token_id}"
-
-    to_address = activity.get("toAddress", "")
-    to_display = await get_ens_or_short(to_address, coll_config.get("chain", "ethereum"))
+        token_name = f"{cfg.token_name_prefix} #{token_id}"
 
     tx_info = activity.get("transactionInfo", {})
     tx_hash = tx_info.get("transactionId", "noTxHash")
-    transaction_link_base = coll_config.get("transaction_link_base", "https://abscan.org/tx/")
-    transaction_link = f"{transaction_link_base}{tx_hash}"
+    transaction_link = f"{cfg.tx_link_base}{tx_hash}"
 
-    # Try to get image from mediaV2 first, fallback to fetching from metadata
-    media_v2 = asset.get("mediaV2", {})
-    main_media = media_v2.get("main", {})
-    token_image_url = main_media.get("uri", "")
-
-    if not token_image_url:
-        token_image_url = await fetch_token_image(token_id, coll_config)
+    to_address = activity.get("toAddress", "")
+    # Resolve the owner and the image (from mediaV2, else token metadata) concurrently
+    to_display, token_image_url = await asyncio.gather(
+        get_ens_or_short(to_address, cfg.chain),
+        get_token_image(asset, token_id, cfg),
+    )
 
     embed = discord.Embed(
         title=f"{token_name} just minted!",
@@ -677,36 +1285,26 @@ async def build_mint_embed_me(activity, coll_config):
     embed.set_footer(text="Powered by Oekaki.io")
     return embed
 
-async def build_burn_embed_me(activity, coll_config):
+async def build_burn_embed_me(activity, cfg):
     """Build Discord embed for Magic Eden BURN activity."""
-    print(f"[DEBUG] build_burn_embed_me() - Building embed for activity: {activity.get('activityId')}")
+    logger.debug("build_burn_embed_me() - Building embed for activity: %s", activity.get('activityId'))
 
     asset = activity.get("asset", {})
     token_id = asset.get("tokenId", "???")
     token_name = asset.get("name") or f"Token #{token_id}"
 
-    burn_messages = coll_config.get("burn_messages", [])
-    if not burn_messages:
-        burn_messages = [
-            {"weight": 1.0, "message": "{tokenName} has been burned!"}
-        ]
-    burn_title = weighted_burn_message(burn_messages, token_name)
-
-    from_address = activity.get("fromAddress", "")
-    from_display = await get_ens_or_short(from_address, coll_config.get("chain", "ethereum"))
+    burn_title = weighted_burn_message(cfg.burn_messages, cfg.burn_cum_weights, token_name)
 
     tx_info = activity.get("transactionInfo", {})
     tx_hash = tx_info.get("transactionId", "noTxHash")
-    transaction_link_base = coll_config.get("transaction_link_base", "https://abscan.org/tx/")
-    transaction_link = f"{transaction_link_base}{tx_hash}"
-
-    # Try to get image from mediaV2 first, fallback to fetching from metadata
-    media_v2 = asset.get("mediaV2", {})
-    main_media = media_v2.get("main", {})
-    token_image_url = main_media.get("uri", "")
+    transaction_link = f"{cfg.tx_link_base}{tx_hash}"
 
-    if not token_image_url:
-        token_image_url = await fetch_token_image(token_id, coll_config)
+    from_address = activity.get("fromAddress", "")
+    # Resolve the previous owner and the image (from mediaV2, else token metadata) concurrently
+    from_display, token_image_url = await asyncio.gather(
+        get_ens_or_short(from_address, cfg.chain),
+        get_token_image(asset, token_id, cfg),
+    )
 
     embed = discord.Embed(
         title=burn_title,
@@ -721,9 +1319,9 @@ async def build_burn_embed_me(activity, coll_config):
     embed.set_footer(text="Powered by Oekaki.io")
     return embed
 
-async def build_opensea_sale_embed(event, coll_config):
+async def build_opensea_sale_embed(event, cfg):
     """Build Discord embed for OpenSea sale event (event_type=sale)."""
-    print(f"[DEBUG] build_opensea_sale_embed() - Building embed for OpenSea event")
+    logger.debug("build_opensea_sale_embed() - Building embed for OpenSea event")
 
     # OpenSea uses "nft" field for asset info
     nft = event.get("nft", {})
@@ -754,13 +1352,16 @@ async def build_opensea_sale_embed(event, coll_config):
     seller_address = event.get("seller", "")
     buyer_address = event.get("buyer", "")
 
-    seller_display = await get_ens_or_short(seller_address, coll_config.get("chain", "ethereum")) if seller_address else "Unknown"
-    buyer_display = await get_ens_or_short(buyer_address, coll_config.get("chain", "ethereum")) if buyer_address else "Unknown"
+    chain = cfg.chain
+    # Resolve seller and buyer concurrently
+    seller_display, buyer_display = await asyncio.gather(
+        get_ens_or_short_or_unknown(seller_address, chain),
+        get_ens_or_short_or_unknown(buyer_address, chain),
+    )
 
     # Transaction is a direct string field
     tx_hash = event.get("transaction", "noTxHash")
-    transaction_link_base = coll_config.get("transaction_link_base", "https://abscan.org/tx/")
-    transaction_link = f"{transaction_link_base}{tx_hash}"
+    transaction_link = f"{cfg.tx_link_base}{tx_hash}"
 
     embed = discord.Embed(
         title=f"{token_name} has been sold!!!",
@@ -784,14 +1385,54 @@ async def build_opensea_sale_embed(event, coll_config):
 #################################
 # Token Metadata Fetch
 #################################
-def sync_fetch_token_image(metadata_url):
+TOKEN_IMAGE_CACHE_MAX_SIZE = 10000
+
+token_image_cache = {}  # (contract, token_id) -> image url, oldest first
+token_image_inflight = {}  # (contract, token_id) -> asyncio.Task of a metadata fetch in progress
+
+async def get_token_image(asset, token_id, cfg):
+    """Use the activity's mediaV2 image if present, otherwise fall back to the token metadata."""
+    media_v2 = asset.get("mediaV2", {})
+    main_media = media_v2.get("main", {})
+    token_image_url = main_media.get("uri", "")
+    if token_image_url:
+        return token_image_url
+    return await fetch_token_image(token_id, cfg)
+
+async def fetch_token_image(token_id, cfg):
+    base_uri = cfg.json_base_uri
+    if not base_uri or token_id == "???":
+        logger.debug("fetch_token_image() - No base URI or unknown token ID; returning None.")
+        return None
+
+    # A token's metadata image doesn't change, so only fetch it once per token
+    cache_key = (cfg.contract, token_id)
+    cached_url = token_image_cache.get(cache_key)
+    if cached_url:
+        return cached_url
+
+    # Join any fetch already in flight for this token (e.g. a mint and a sale in the same cycle)
+    metadata_url = f"{base_uri}/{token_id}"
+    return await single_flight(
+        token_image_inflight, cache_key, lambda: fetch_and_cache_token_image(cache_key, metadata_url)
+    )
+
+async def fetch_and_cache_token_image(cache_key, metadata_url):
+    image_url = await fetch_image_from_metadata(metadata_url)
+    # Failures aren't cached, so a temporarily unavailable metadata host is retried next time
+    if image_url:
+        token_image_cache[cache_key] = image_url
+        while len(token_image_cache) > TOKEN_IMAGE_CACHE_MAX_SIZE:
+            del token_image_cache[next(iter(token_image_cache))]
+    return image_url
+
+async def fetch_image_from_metadata(metadata_url):
+    logger.debug("fetch_image_from_metadata() - Fetching metadata from %s", metadata_url)
     try:
-        resp = requests.get(metadata_url, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
+        data = await get_json(metadata_url, timeout=10)
         image_field = data.get("image", "")
         if not image_field:
-            print("[DEBUG] sync_fetch_token_image() - 'image' field empty.")
+            logger.debug("fetch_image_from_metadata() - 'image' field empty.")
             return None
 
         if image_field.startswith("ipfs://"):
@@ -800,22 +1441,25 @@ def sync_fetch_token_image(metadata_url):
         else:
             return image_field
     except Exception as e:
-        print(f"[DEBUG] Error fetching token metadata from {metadata_url}: {e}")
-        return None
-
-async def fetch_token_image(token_id, coll_config):
-    base_uri = coll_config.get("json_base_uri", "").rstrip("/")
-    if not base_uri or token_id == "???":
-        print("[DEBUG] fetch_token_image() - No base URI or unknown token ID; returning None.")
+        logger.warning("Error fetching token metadata from %s: %s", metadata_url, e)
         return None
 
-    metadata_url = f"{base_uri}/{token_id}"
-    print(f"[DEBUG] fetch_token_image() - Fetching metadata from {metadata_url}")
-    return await asyncio.to_thread(sync_fetch_token_image, metadata_url)
-
 #################################
 # Utility
 #################################
+# Serializes writes between the flush loops' worker threads and the shutdown flush.
+# Cancelling a task awaiting asyncio.to_thread doesn't stop the thread, so without this
+# the shutdown flush could write the same .tmp file while a thread is still writing it.
+file_write_lock = threading.Lock()
+
+def write_file_atomic(filename, data: bytes):
+    """Write data to a temp file, then os.replace it so readers never see a partial file."""
+    tmp_filename = f"{filename}.tmp"
+    with file_write_lock:
+        with open(tmp_filename, "wb") as f:
+            f.write(data)
+        os.replace(tmp_filename, filename)
+
 def shorten_address(address: str, chars=6) -> str:
     address = address.lower()
     if len(address) > 2 + chars * 2:
@@ -823,24 +1467,13 @@ def shorten_address(address: str, chars=6) -> str:
     else:
         return address
 
-def iso_to_unix(iso_timestamp: str) -> int:
-    """Convert ISO 8601 timestamp to Unix timestamp (seconds)."""
-    from datetime import datetime
-    try:
-        dt = datetime.fromisoformat(iso_timestamp.replace('Z', '+00:00'))
-        return int(dt.timestamp())
-    except Exception as e:
-        print(f"[DEBUG] Error converting ISO timestamp {iso_timestamp}: {e}")
-        return 0
-
 def unix_to_iso(unix_timestamp: int) -> str:
     """Convert Unix timestamp (seconds) to ISO 8601 format."""
-    from datetime import datetime, timezone
     try:
         dt = datetime.fromtimestamp(unix_timestamp, tz=timezone.utc)
         return dt.isoformat().replace('+00:00', 'Z')
     except Exception as e:
-        print(f"[DEBUG] Error converting Unix timestamp {unix_timestamp}: {e}")
+        logger.warning("Error converting Unix timestamp %s: %s", unix_timestamp, e)
         return ""
 
 random.seed(int(time.time()))
@@ -848,15 +1481,40 @@ random.seed(int(time.time()))
 #################################
 # Discord Bot Events
 #################################
+state_flush_task = None
+ens_flush_task = None
+poll_task = None
+
 @bot.event
 async def on_ready():
-    print(f"Bot logged in as {bot.user} (ID: {bot.user.id})")
-    print("[DEBUG] on_ready() - Starting check_all_collections task loop...")
-    check_all_collections.start()
+    global http_session, state_flush_task, ens_flush_task, poll_task
+    logger.info("Bot logged in as %s (ID: %s)", bot.user, bot.user.id)
+    if http_session is None or http_session.closed:
+        http_session = create_http_session()
+    if state_flush_task is None:
+        state_flush_task = asyncio.create_task(flush_state_loop())
+    if ENS_ENABLED and ens_flush_task is None:
+        ens_flush_task = asyncio.create_task(flush_ens_cache_loop())
+    refresh_channel_cache()
+    # on_ready fires again after reconnects, so only start the poll loop once
+    if poll_task is None or poll_task.done():
+        logger.debug("on_ready() - Starting collection poll loop...")
+        poll_task = asyncio.create_task(poll_collections_loop())
 
 #################################
 # Main
 #################################
 if __name__ == "__main__":
-    print("[DEBUG] Starting bot.run()...")
-    bot.run(DISCORD_BOT_TOKEN)
+    if uvloop is not None:
+        logger.info("Using uvloop event loop.")
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.debug("Starting bot.run()...")
+    try:
+        # log_handler=None: discord.py logs through the root logger configured above
+        bot.run(DISCORD_BOT_TOKEN, log_handler=None)
+    finally:
+        # Write anything the flush loops hadn't picked up yet, even if run() raised (e.g. LoginFailure)
+        flush_dirty_state()
+        save_ens_cache()
+        # Write out any log records still queued
+        log_listener.stop()